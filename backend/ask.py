@@ -1,4 +1,4 @@
-"""POST /api/ask – load FAISS, RAG, save question. Enforce max 2 questions."""
+"""POST /api/ask – load FAISS corpus, RAG (optionally filtered by video), save question. Enforce max questions per user."""
 from pathlib import Path
 from typing import Annotated
 
@@ -18,6 +18,7 @@ settings = Settings()
 
 class AskRequest(BaseModel):
     question: str
+    video_ids: list[str] | None = None  # limit the search to these videos; default is all
 
 
 class AskResponse(BaseModel):
@@ -31,28 +32,39 @@ def ask(
     user_id: Annotated[int, Depends(get_current_user_id)],
     db: Annotated[Session, Depends(get_db)],
 ):
-    user_doc = db.query(UserDoc).filter(UserDoc.user_id == user_id).first()
-    if not user_doc:
+    user_video_ids = {
+        video_id for (video_id,) in db.query(UserDoc.video_id).filter(UserDoc.user_id == user_id).all()
+    }
+    if not user_video_ids:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Add a video first.",
         )
     question_count = db.query(Question).filter(Question.user_id == user_id).count()
-    if question_count >= 2:
+    if question_count >= settings.max_questions:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
-            detail="You have used your 2 questions.",
+            detail=f"You have used your {settings.max_questions} questions.",
         )
     question_text = (body.question or "").strip()
     if not question_text:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="question is required")
+    video_ids = None
+    if body.video_ids:
+        video_ids = list(dict.fromkeys(v.strip() for v in body.video_ids))
+        unknown = [v for v in video_ids if v not in user_video_ids]
+        if unknown:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Not in your library: {', '.join(unknown)}",
+            )
     store_path = Path(settings.stores_path) / str(user_id)
     if not (store_path / "index.faiss").exists():
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Add a video first.",
         )
-    retriever = load_faiss_retriever(store_path, k=4)
+    retriever = load_faiss_retriever(store_path, k=4, video_ids=video_ids)
     chain = build_rag_chain(retriever)
     answer = chain.invoke(question_text)
     q = Question(
@@ -62,5 +74,5 @@ def ask(
     )
     db.add(q)
     db.commit()
-    remaining = max(0, 2 - (question_count + 1))
+    remaining = max(0, settings.max_questions - (question_count + 1))
     return AskResponse(answer=answer, remaining_questions=remaining)
@@ -0,0 +1,85 @@
+"""Measure peak RSS of transcript ingestion on a synthetic long transcript.
+
+Uses fake embeddings, so no OpenAI key or network is needed. Run each mode in its own
+process (ru_maxrss is a per-process high-water mark) and compare:
+
+    python bench_ingest.py --hours 10 --mode streaming
+    python bench_ingest.py --hours 10 --mode eager
+"""
+import argparse
+import resource
+import sys
+import tempfile
+import time
+from typing import Iterator
+
+from langchain_community.embeddings import FakeEmbeddings
+from langchain_community.vectorstores import FAISS
+from langchain_core.documents import Document
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+import rag_chain
+
+SNIPPET_SECONDS = 3.0
+WORDS = "the model uses a vector index to answer questions about this long stream".split()
+
+
+def synthetic_transcript(hours: float) -> Iterator[dict]:
+    """Yield one ~3 second snippet at a time, like a multi-hour livestream transcript."""
+    count = int(hours * 3600 / SNIPPET_SECONDS)
+    for i in range(count):
+        words = [WORDS[(i + j) % len(WORDS)] for j in range(12)]
+        yield {"text": f"{i} " + " ".join(words), "start": i * SNIPPET_SECONDS, "duration": SNIPPET_SECONDS}
+
+
+def ingest_eager(hours: float, store_path: str) -> int:
+    """Previous pipeline: full snippet list -> Documents -> chunks -> one-shot FAISS build."""
+    formatted = list(synthetic_transcript(hours))
+    docs = [
+        Document(page_content=item["text"], metadata={"start": item["start"], "duration": item["duration"]})
+        for item in formatted
+    ]
+    splitter = RecursiveCharacterTextSplitter(chunk_size=rag_chain.CHUNK_SIZE, chunk_overlap=rag_chain.CHUNK_OVERLAP)
+    chunked = splitter.split_documents(docs)
+    vector_store = FAISS.from_documents(chunked, rag_chain.get_embeddings())
+    vector_store.save_local(store_path)
+    return len(chunked)
+
+
+def ingest_streaming(hours: float, store_path: str, batch_size: int) -> int:
+    corpus = rag_chain.CorpusIndex(store_path)
+    chunks = corpus.add_transcript("synthetic", synthetic_transcript(hours), batch_size=batch_size)
+    corpus.save()
+    return chunks
+
+
+def peak_rss_mb() -> float:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KiB, macOS reports bytes
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--hours", type=float, default=10.0)
+    parser.add_argument("--mode", choices=["streaming", "eager"], default="streaming")
+    parser.add_argument("--batch-size", type=int, default=rag_chain.settings.embed_batch_size)
+    parser.add_argument("--dim", type=int, default=1536, help="embedding size (text-embedding-3-small is 1536)")
+    args = parser.parse_args()
+
+    rag_chain._embeddings = FakeEmbeddings(size=args.dim)
+    baseline = peak_rss_mb()
+    started = time.perf_counter()
+    with tempfile.TemporaryDirectory() as store_path:
+        if args.mode == "eager":
+            chunks = ingest_eager(args.hours, store_path)
+        else:
+            chunks = ingest_streaming(args.hours, store_path, args.batch_size)
+    elapsed = time.perf_counter() - started
+    index_mb = chunks * args.dim * 4 / (1024 * 1024)
+    print(f"mode={args.mode} hours={args.hours} chunks={chunks} elapsed={elapsed:.1f}s")
+    print(f"peak_rss={peak_rss_mb():.1f}MB baseline_rss={baseline:.1f}MB index_vectors={index_mb:.1f}MB")
+
+
+if __name__ == "__main__":
+    main()
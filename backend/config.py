@@ -11,9 +11,15 @@ class Settings(BaseSettings):
     """Settings loaded from environment."""
 
     openai_api_key: str = ""
+    openai_base_url: str = ""  # OpenAI-compatible endpoint; empty means api.openai.com
+    transcript_base_url: str = ""  # JSON transcript service; empty means YouTube
     secret_key: str = "change-me-in-production"
     database_url: str = "sqlite:///./yt_rag.db"
     stores_path: str = "./data/stores"
+    embed_batch_size: int = 256
+    ingest_workers: int = 4
+    max_questions: int = 2
+    store_cache_size: int = 32  # loaded FAISS stores kept in memory for /api/ask
 
     class Config:
         env_file = _env_path
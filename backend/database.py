@@ -1,5 +1,7 @@
 """Database connection and session; create tables."""
-from sqlalchemy import create_engine
+from pathlib import Path
+
+from sqlalchemy import create_engine, inspect, text
 from sqlalchemy.orm import sessionmaker
 
 from config import Settings
@@ -15,9 +17,41 @@ SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 def init_db() -> None:
     """Create all tables."""
+    _migrate_user_docs()
     Base.metadata.create_all(bind=engine)
 
 
+def _migrate_user_docs() -> None:
+    """Move user_docs from one video per user (user_id primary key) to the multi-video layout."""
+    from rag_chain import migrate_legacy_store, store_lock
+
+    # Every uvicorn worker runs this on startup; the lock on the stores root lets one migrate
+    with store_lock(Path(settings.stores_path)):
+        if "user_docs" not in inspect(engine).get_table_names():
+            return
+        columns = {c["name"] for c in inspect(engine).get_columns("user_docs")}
+        if "id" in columns:
+            return
+        # Stores first: re-keying is idempotent, so a crash here leaves a retryable state
+        with engine.connect() as conn:
+            rows = conn.execute(text("SELECT user_id, video_id FROM user_docs")).all()
+        for user_id, video_id in rows:
+            store_path = Path(settings.stores_path) / str(user_id)
+            with store_lock(store_path):
+                migrate_legacy_store(store_path, video_id)
+        with engine.begin() as conn:
+            conn.execute(text("ALTER TABLE user_docs RENAME TO user_docs_legacy"))
+        Base.metadata.create_all(bind=engine)
+        with engine.begin() as conn:
+            conn.execute(
+                text(
+                    "INSERT INTO user_docs (user_id, video_id, created_at) "
+                    "SELECT user_id, video_id, created_at FROM user_docs_legacy"
+                )
+            )
+            conn.execute(text("DROP TABLE user_docs_legacy"))
+
+
 def get_db():
     """Dependency that yields a DB session."""
     db = SessionLocal()
@@ -0,0 +1,6 @@
+"""Load generator for the API: real app, stub OpenAI and transcript servers, latency/SLO report.
+
+Run from the backend directory:
+
+    python -m loadtest --users 50 --rate 10 --duration 60
+"""
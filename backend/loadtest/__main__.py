@@ -0,0 +1,389 @@
+"""Async load generator: register users, ingest videos, fire /api/ask at a Poisson arrival rate.
+
+Starts stub OpenAI and transcript servers in one subprocess (loadtest.stub_server) and the
+real app in another (loadtest.app_server) against a throwaway SQLite DB and store directory,
+so this process only drives traffic and measures. Samples saturation
+gauges while traffic runs, and prints throughput, p50/p95/p99 and error rates per phase.
+
+    python -m loadtest --users 50 --videos-per-user 3 --rate 10 --duration 60 --threads 40
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter
+from dataclasses import dataclass, field
+from pathlib import Path
+
+import httpx
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+
+
+@dataclass
+class Phase:
+    """Latencies and outcomes of one traffic phase, plus saturation samples taken during it."""
+
+    name: str
+    started: float = 0.0
+    ended: float = 0.0
+    latencies_ms: list[float] = field(default_factory=list)
+    statuses: Counter = field(default_factory=Counter)
+    samples: list[dict] = field(default_factory=list)
+    videos: Counter = field(default_factory=Counter)
+
+    def record(self, status: int | str, latency_ms: float) -> None:
+        self.statuses[status] += 1
+        if status == 200:
+            self.latencies_ms.append(latency_ms)
+
+    def record_videos(self, video_ids: list[str], response: httpx.Response | None) -> list[str]:
+        """Count per-video outcomes of /api/videos, which answers 200 even when some videos fail.
+
+        Every id counts as failed when the request itself failed. Returns the added ids.
+        """
+        if response is None or response.status_code != 200:
+            self.videos["failed"] += len(video_ids)
+            return []
+        results = response.json()["results"]
+        self.videos.update(x["status"] for x in results)
+        return [x["video_id"] for x in results if x["status"] == "added"]
+
+    def report(self) -> dict:
+        total = sum(self.statuses.values())
+        ok = self.statuses.get(200, 0)
+        wall = max(self.ended - self.started, 1e-9)
+        latencies = sorted(self.latencies_ms)
+        return {
+            "phase": self.name,
+            "requests": total,
+            "ok": ok,
+            "error_rate": round((total - ok) / total, 4) if total else 0.0,
+            "statuses": {str(k): v for k, v in sorted(self.statuses.items(), key=lambda kv: str(kv[0]))},
+            "throughput_rps": round(ok / wall, 2),
+            "wall_s": round(wall, 2),
+            "p50_ms": percentile(latencies, 50),
+            "p95_ms": percentile(latencies, 95),
+            "p99_ms": percentile(latencies, 99),
+            "max_ms": round(latencies[-1], 1) if latencies else None,
+            "saturation": saturation(self.samples),
+            **self.video_report(),
+        }
+
+    def video_report(self) -> dict:
+        total = sum(self.videos.values())
+        if not total:
+            return {}
+        return {
+            "videos": dict(self.videos),
+            "video_failure_rate": round(self.videos.get("failed", 0) / total, 4),
+        }
+
+
+def percentile(sorted_values: list[float], pct: float) -> float | None:
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return None
+    rank = max(1, int(-(-pct * len(sorted_values) // 100)))
+    return round(sorted_values[rank - 1], 1)
+
+
+def saturation(samples: list[dict]) -> dict:
+    """Summarize app gauges: how often the threadpool / DB pool were full and how deep queues got."""
+    if not samples:
+        return {}
+    n = len(samples)
+    first, last = samples[0], samples[-1]
+    return {
+        "samples": n,
+        "threads_total": last["threads_total"],
+        "threads_busy_max": max(s["threads_busy"] for s in samples),
+        "threads_busy_mean": round(sum(s["threads_busy"] for s in samples) / n, 1),
+        "threads_full_pct": round(100 * sum(s["threads_busy"] >= s["threads_total"] for s in samples) / n, 1),
+        "threads_waiting_max": max(s["threads_waiting"] for s in samples),
+        "db_pool_capacity": last["db_pool_capacity"],
+        "db_pool_checked_out_max": max(s["db_pool_checked_out"] for s in samples),
+        "db_pool_full_pct": round(
+            100 * sum(s["db_pool_checked_out"] >= s["db_pool_capacity"] > 0 for s in samples) / n, 1
+        ),
+        "db_inflight_max": max(s["db_inflight"] for s in samples),
+        "db_exec_seconds": round(last["db_exec_seconds"] - first["db_exec_seconds"], 3),
+        "db_exec_max_ms": last["db_exec_max_ms"],
+        "db_locked_errors": last["db_locked_errors"] - first["db_locked_errors"],
+    }
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def spawn(module: str, *args: str, env: dict | None = None) -> subprocess.Popen:
+    return subprocess.Popen([sys.executable, "-m", module, *args], cwd=BACKEND_DIR, env=env)
+
+
+def stop(proc: subprocess.Popen) -> None:
+    proc.terminate()
+    try:
+        proc.wait(timeout=10)
+    except subprocess.TimeoutExpired:
+        proc.kill()
+        proc.wait()
+
+
+async def wait_ready(url: str, proc: subprocess.Popen, timeout: float = 60.0) -> None:
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient(timeout=5) as client:
+        while time.monotonic() < deadline:
+            if proc.poll() is not None:
+                raise RuntimeError(f"{proc.args[2]} exited with code {proc.returncode}")
+            try:
+                if (await client.get(url)).status_code == 200:
+                    return
+            except httpx.TransportError:
+                pass
+            await asyncio.sleep(0.2)
+    raise RuntimeError(f"{url} did not come up in time")
+
+
+async def timed(client: httpx.AsyncClient, phase: Phase, method: str, url: str, **kwargs) -> httpx.Response | None:
+    started = time.perf_counter()
+    try:
+        response = await client.request(method, url, **kwargs)
+    except httpx.HTTPError as e:
+        phase.record(type(e).__name__, (time.perf_counter() - started) * 1000)
+        return None
+    phase.record(response.status_code, (time.perf_counter() - started) * 1000)
+    return response
+
+
+async def sampler(client: httpx.AsyncClient, phases: list[Phase], interval: float) -> None:
+    """Poll the app's probe endpoint and attach samples to the phase currently running."""
+    while True:
+        try:
+            sample = (await client.get("/__loadtest/stats")).json()
+        except httpx.HTTPError:
+            sample = None
+        if sample is not None and phases:
+            phases[-1].samples.append(sample)
+        await asyncio.sleep(interval)
+
+
+async def run_phase(phases: list[Phase], name: str, coros) -> Phase:
+    phase = Phase(name)
+    phases.append(phase)
+    phase.started = time.perf_counter()
+    await asyncio.gather(*(coro(phase) for coro in coros))
+    phase.ended = time.perf_counter()
+    return phase
+
+
+async def drive(args, client: httpx.AsyncClient, phases: list[Phase]) -> None:
+    rng = random.Random(args.seed)
+    tokens: dict[int, str] = {}
+    videos: dict[int, list[str]] = {}
+
+    def register(i: int):
+        async def go(phase: Phase):
+            r = await timed(
+                client, phase, "POST", "/auth/register",
+                json={"email": f"load{i}@example.com", "password": "load-test"},
+            )
+            if r is not None and r.status_code == 200:
+                tokens[i] = r.json()["access_token"]
+        return go
+
+    def ingest(i: int):
+        async def go(phase: Phase):
+            ids = [f"vid{i}x{n}" for n in range(args.videos_per_user)]
+            headers = {"Authorization": f"Bearer {tokens[i]}"}
+            r = await timed(client, phase, "POST", "/api/videos", json={"video_ids": ids}, headers=headers)
+            added = phase.record_videos(ids, r)
+            if added:
+                videos[i] = added
+        return go
+
+    await run_phase(phases, "register", [register(i) for i in range(args.users)])
+    await run_phase(phases, "ingest", [ingest(i) for i in tokens])
+    if not videos:
+        print("no user has an ingested video; skipping ask phase", file=sys.stderr)
+        return
+
+    async def open_loop(rate: float, send) -> None:
+        """Open-loop arrivals: requests start on schedule whether or not earlier ones finished."""
+        in_flight = []
+        deadline = time.perf_counter() + args.duration
+        while time.perf_counter() < deadline:
+            in_flight.append(asyncio.create_task(send()))
+            await asyncio.sleep(rng.expovariate(rate))
+        await asyncio.gather(*in_flight)
+
+    users = list(videos)
+    mixed = Phase("ask_phase_ingest")
+    batches = Counter()
+
+    async def send_ask(phase: Phase):
+        user = rng.choice(users)
+        body = {"question": rng.choice(["What is covered?", "Summarize the main idea.", "What example is used?"])}
+        if rng.random() < args.filter_ratio:
+            body["video_ids"] = rng.sample(videos[user], k=rng.randint(1, len(videos[user])))
+        headers = {"Authorization": f"Bearer {tokens[user]}"}
+        await timed(client, phase, "POST", "/api/ask", json=body, headers=headers)
+
+    async def send_ingest():
+        """New videos for a user who is also being asked about, so writes race with reads of the same store."""
+        user = rng.choice(users)
+        batches[user] += 1
+        ids = [f"vid{user}m{batches[user]}x{n}" for n in range(args.videos_per_user)]
+        headers = {"Authorization": f"Bearer {tokens[user]}"}
+        r = await timed(client, mixed, "POST", "/api/videos", json={"video_ids": ids}, headers=headers)
+        videos[user].extend(mixed.record_videos(ids, r))
+
+    async def ask_traffic(phase: Phase):
+        loops = [open_loop(args.rate, lambda: send_ask(phase))]
+        if args.mixed_ingest_rate > 0:
+            mixed.started = time.perf_counter()
+            loops.append(open_loop(args.mixed_ingest_rate, send_ingest))
+        await asyncio.gather(*loops)
+        mixed.ended = time.perf_counter()
+
+    ask = await run_phase(phases, "ask", [ask_traffic])
+    if args.mixed_ingest_rate > 0:
+        mixed.samples = ask.samples
+        phases.append(mixed)
+
+
+async def main_async(args) -> list[dict]:
+    openai_port, transcript_port, app_port = free_port(), free_port(), free_port()
+    openai_url, transcript_url = f"http://127.0.0.1:{openai_port}", f"http://127.0.0.1:{transcript_port}"
+    stubs = spawn(
+        "loadtest.stub_server",
+        "--openai-port", str(openai_port),
+        "--transcript-port", str(transcript_port),
+        "--embed-latency-ms", str(args.embed_latency_ms),
+        "--chat-latency-ms", str(args.chat_latency_ms),
+        "--transcript-latency-ms", str(args.transcript_latency_ms),
+        "--jitter", str(args.jitter),
+        "--openai-error-rate", str(args.openai_error_rate),
+        "--transcript-error-rate", str(args.transcript_error_rate),
+        "--snippets", str(args.snippets),
+    )
+    try:
+        await wait_ready(f"{openai_url}/__stub/calls", stubs)
+        await wait_ready(f"{transcript_url}/__stub/calls", stubs)
+        with tempfile.TemporaryDirectory(prefix="yt-rag-load-") as tmp:
+            env = {
+                **os.environ,
+                "OPENAI_API_KEY": "stub",
+                "OPENAI_BASE_URL": f"{openai_url}/v1",
+                "TRANSCRIPT_BASE_URL": transcript_url,
+                "DATABASE_URL": f"sqlite:///{tmp}/load.db",
+                "STORES_PATH": f"{tmp}/stores",
+                "MAX_QUESTIONS": str(10**9),
+                "INGEST_WORKERS": str(args.ingest_workers),
+            }
+            proc = spawn("loadtest.app_server", "--port", str(app_port), "--threads", str(args.threads), env=env)
+            phases: list[Phase] = []
+            limits = httpx.Limits(max_connections=args.max_connections, max_keepalive_connections=args.max_connections)
+            try:
+                await wait_ready(f"http://127.0.0.1:{app_port}/", proc)
+                async with httpx.AsyncClient(
+                    base_url=f"http://127.0.0.1:{app_port}", timeout=args.timeout, limits=limits
+                ) as client, httpx.AsyncClient(base_url=f"http://127.0.0.1:{app_port}", timeout=5) as probe_client:
+                    sampling = asyncio.create_task(sampler(probe_client, phases, args.sample_interval))
+                    try:
+                        await drive(args, client, phases)
+                    finally:
+                        sampling.cancel()
+            finally:
+                stop(proc)
+        upstream = Counter()
+        async with httpx.AsyncClient(timeout=5) as client:
+            for url in (openai_url, transcript_url):
+                upstream.update((await client.get(f"{url}/__stub/calls")).json())
+    finally:
+        stop(stubs)
+    reports = [phase.report() for phase in phases]
+    reports.append({"phase": "upstream_calls", **dict(upstream)})
+    return reports
+
+
+def print_report(reports: list[dict]) -> None:
+    for report in reports:
+        if report["phase"] == "upstream_calls":
+            calls = ", ".join(f"{k}={v}" for k, v in sorted(report.items()) if k != "phase")
+            print(f"\nupstream stub calls: {calls}")
+            continue
+        print(f"\n== {report['phase']} ==")
+        print(
+            f"requests={report['requests']} ok={report['ok']} error_rate={report['error_rate']:.2%} "
+            f"throughput={report['throughput_rps']}/s wall={report['wall_s']}s"
+        )
+        print(f"statuses: {report['statuses']}")
+        if "videos" in report:
+            print(f"videos: {report['videos']} failure_rate={report['video_failure_rate']:.2%}")
+        print(
+            f"latency ms (ok): p50={report['p50_ms']} p95={report['p95_ms']} "
+            f"p99={report['p99_ms']} max={report['max_ms']}"
+        )
+        s = report["saturation"]
+        if s:
+            print(
+                f"threadpool: busy max {s['threads_busy_max']}/{s['threads_total']} "
+                f"(mean {s['threads_busy_mean']}, full {s['threads_full_pct']}% of samples), "
+                f"queued max {s['threads_waiting_max']}"
+            )
+            print(
+                f"db: pool max {s['db_pool_checked_out_max']}/{s['db_pool_capacity']} "
+                f"(full {s['db_pool_full_pct']}%), in-flight max {s['db_inflight_max']}, "
+                f"stmt time {s['db_exec_seconds']}s, slowest stmt {s['db_exec_max_ms']}ms, "
+                f"locked errors {s['db_locked_errors']}"
+            )
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Load-test the API against stub OpenAI and transcript servers.")
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--videos-per-user", type=int, default=2)
+    parser.add_argument("--snippets", type=int, default=200, help="transcript snippets per stub video")
+    parser.add_argument("--rate", type=float, default=5.0, help="mean /api/ask arrivals per second")
+    parser.add_argument("--duration", type=float, default=30.0, help="seconds of /api/ask traffic")
+    parser.add_argument(
+        "--mixed-ingest-rate", type=float, default=0.0,
+        help="mean /api/videos arrivals per second during the ask phase (0 keeps phases separate)",
+    )
+    parser.add_argument("--filter-ratio", type=float, default=0.5, help="share of asks with a video_ids filter")
+    parser.add_argument("--threads", type=int, default=40, help="app threadpool size (anyio default is 40)")
+    parser.add_argument("--ingest-workers", type=int, default=4)
+    parser.add_argument("--embed-latency-ms", type=float, default=50.0)
+    parser.add_argument("--chat-latency-ms", type=float, default=500.0)
+    parser.add_argument("--transcript-latency-ms", type=float, default=100.0)
+    parser.add_argument("--jitter", type=float, default=0.2, help="latency stddev as a fraction of the mean")
+    parser.add_argument("--openai-error-rate", type=float, default=0.0)
+    parser.add_argument("--transcript-error-rate", type=float, default=0.0)
+    parser.add_argument("--max-connections", type=int, default=500)
+    parser.add_argument("--timeout", type=float, default=120.0, help="client timeout per request, seconds")
+    parser.add_argument("--sample-interval", type=float, default=0.25)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", type=Path, help="also write the report to this file")
+    return parser.parse_args(argv)
+
+
+def main() -> None:
+    args = parse_args()
+    random.seed(args.seed)
+    reports = asyncio.run(main_async(args))
+    print_report(reports)
+    if args.json:
+        args.json.write_text(json.dumps(reports, indent=2))
+
+
+if __name__ == "__main__":
+    main()
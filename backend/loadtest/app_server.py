@@ -0,0 +1,108 @@
+"""Run the real app (main.app) with saturation probes; started as a subprocess by the load generator.
+
+    python -m loadtest.app_server --port 8100 --threads 40
+
+Settings come from the environment as usual. GET /__loadtest/stats reports threadpool,
+DB pool and SQLite lock gauges; it is async so it still answers when the threadpool is full.
+"""
+import argparse
+import asyncio
+import threading
+import time
+
+import anyio.to_thread
+import uvicorn
+from sqlalchemy import event
+
+import main
+from database import engine
+
+
+class DbProbe:
+    """Counts in-flight statements, statement time and "database is locked" errors."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.inflight = 0
+        self.statements = 0
+        self.exec_seconds = 0.0
+        self.exec_max_ms = 0.0
+        self.locked_errors = 0
+
+    def install(self, engine) -> None:
+        event.listen(engine, "before_cursor_execute", self._before)
+        event.listen(engine, "after_cursor_execute", self._after)
+        event.listen(engine, "handle_error", self._error)
+
+    def _before(self, conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("loadtest_started", []).append(time.perf_counter())
+        with self._lock:
+            self.inflight += 1
+
+    def _after(self, conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info["loadtest_started"].pop()
+        with self._lock:
+            self.inflight -= 1
+            self.statements += 1
+            self.exec_seconds += elapsed
+            self.exec_max_ms = max(self.exec_max_ms, elapsed * 1000)
+
+    def _error(self, context):
+        started = context.connection.info.get("loadtest_started") if context.connection else None
+        with self._lock:
+            # Errors can also come from connect/commit, where _before never ran
+            if started:
+                started.pop()
+                self.inflight -= 1
+            if "database is locked" in str(context.original_exception):
+                self.locked_errors += 1
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "db_inflight": self.inflight,
+                "db_statements": self.statements,
+                "db_exec_seconds": round(self.exec_seconds, 3),
+                "db_exec_max_ms": round(self.exec_max_ms, 1),
+                "db_locked_errors": self.locked_errors,
+            }
+
+
+probe = DbProbe()
+probe.install(engine)
+
+
+async def stats():
+    limiter = anyio.to_thread.current_default_thread_limiter()
+    threads = limiter.statistics()
+    pool = engine.pool
+    capacity = pool.size() + max(getattr(pool, "_max_overflow", 0), 0) if hasattr(pool, "size") else 0
+    return {
+        "threads_busy": threads.borrowed_tokens,
+        "threads_total": limiter.total_tokens,
+        "threads_waiting": threads.tasks_waiting,
+        "db_pool_checked_out": pool.checkedout() if hasattr(pool, "checkedout") else 0,
+        "db_pool_capacity": capacity,
+        **probe.snapshot(),
+    }
+
+
+main.app.add_api_route("/__loadtest/stats", stats, methods=["GET"], include_in_schema=False)
+
+
+async def serve(port: int, threads: int) -> None:
+    anyio.to_thread.current_default_thread_limiter().total_tokens = threads
+    config = uvicorn.Config(main.app, host="127.0.0.1", port=port, log_level="warning", access_log=False)
+    await uvicorn.Server(config).serve()
+
+
+def main_cli() -> None:
+    parser = argparse.ArgumentParser(description="Run main.app with load-test probes.")
+    parser.add_argument("--port", type=int, required=True)
+    parser.add_argument("--threads", type=int, default=40, help="threadpool size for sync endpoints")
+    args = parser.parse_args()
+    asyncio.run(serve(args.port, args.threads))
+
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,50 @@
+"""Run the stub OpenAI and transcript servers in their own process; started by the load generator.
+
+    python -m loadtest.stub_server --openai-port 8101 --transcript-port 8102 --chat-latency-ms 500
+
+Keeping them out of the driver process means building stub embeddings and sleeping out
+injected latency never competes with the driver's event loop, so measured latencies are
+the app's. Call counts are served at GET /__stub/calls on each port.
+"""
+import argparse
+import asyncio
+
+import uvicorn
+
+from loadtest.stubs import Faults, create_openai_app, create_transcript_app
+
+
+async def serve(args) -> None:
+    openai_app = create_openai_app(
+        embed=Faults(args.embed_latency_ms, args.embed_latency_ms * args.jitter, args.openai_error_rate),
+        chat=Faults(args.chat_latency_ms, args.chat_latency_ms * args.jitter, args.openai_error_rate),
+        dim=args.dim,
+    )
+    transcript_app = create_transcript_app(
+        Faults(args.transcript_latency_ms, args.transcript_latency_ms * args.jitter, args.transcript_error_rate),
+        snippets_per_video=args.snippets,
+    )
+    servers = [
+        uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning", access_log=False))
+        for app, port in ((openai_app, args.openai_port), (transcript_app, args.transcript_port))
+    ]
+    await asyncio.gather(*(server.serve() for server in servers))
+
+
+def main_cli() -> None:
+    parser = argparse.ArgumentParser(description="Run stub OpenAI and transcript servers.")
+    parser.add_argument("--openai-port", type=int, required=True)
+    parser.add_argument("--transcript-port", type=int, required=True)
+    parser.add_argument("--embed-latency-ms", type=float, default=50.0)
+    parser.add_argument("--chat-latency-ms", type=float, default=500.0)
+    parser.add_argument("--transcript-latency-ms", type=float, default=100.0)
+    parser.add_argument("--jitter", type=float, default=0.2)
+    parser.add_argument("--openai-error-rate", type=float, default=0.0)
+    parser.add_argument("--transcript-error-rate", type=float, default=0.0)
+    parser.add_argument("--snippets", type=int, default=200)
+    parser.add_argument("--dim", type=int, default=1536)
+    asyncio.run(serve(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,125 @@
+"""Stub OpenAI (embeddings + chat) and transcript servers with injected latency and errors."""
+import asyncio
+import base64
+import random
+import time
+import zlib
+from collections import Counter
+from dataclasses import dataclass
+
+import numpy as np
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+
+WORDS = "lecture topic example model data answer question video index search result".split()
+
+
+@dataclass
+class Faults:
+    """Latency (normal, in ms) and error probability applied to every stub request."""
+
+    latency_ms: float = 0.0
+    jitter_ms: float = 0.0
+    error_rate: float = 0.0
+
+    async def apply(self) -> JSONResponse | None:
+        delay = random.gauss(self.latency_ms, self.jitter_ms) if self.jitter_ms else self.latency_ms
+        if delay > 0:
+            await asyncio.sleep(delay / 1000)
+        if random.random() < self.error_rate:
+            return JSONResponse(
+                {"error": {"message": "injected stub failure", "type": "server_error"}},
+                status_code=500,
+            )
+        return None
+
+
+def _vector(text: str, dim: int) -> np.ndarray:
+    rng = np.random.default_rng(zlib.crc32(text.encode("utf-8")))
+    v = rng.standard_normal(dim).astype(np.float32)
+    return v / np.linalg.norm(v)
+
+
+def _counting_app() -> FastAPI:
+    """App with a call Counter in app.state.calls, readable by the driver at GET /__stub/calls."""
+    app = FastAPI()
+    app.state.calls = Counter()
+
+    @app.get("/__stub/calls")
+    async def calls():
+        return dict(app.state.calls)
+
+    return app
+
+
+def create_openai_app(embed: Faults, chat: Faults, dim: int = 1536) -> FastAPI:
+    """OpenAI-compatible /v1/embeddings and /v1/chat/completions; GET /__stub/calls returns call counts."""
+    app = _counting_app()
+
+    @app.post("/v1/embeddings")
+    async def embeddings(request: Request):
+        body = await request.json()
+        error = await embed.apply()
+        app.state.calls["embeddings_error" if error else "embeddings"] += 1
+        if error:
+            return error
+        inputs = body["input"]
+        if isinstance(inputs, str) or (inputs and isinstance(inputs[0], int)):
+            inputs = [inputs]
+        data = []
+        for i, item in enumerate(inputs):
+            v = _vector(str(item), dim)
+            encoded = base64.b64encode(v.tobytes()).decode() if body.get("encoding_format") == "base64" else v.tolist()
+            data.append({"object": "embedding", "index": i, "embedding": encoded})
+        return {
+            "object": "list",
+            "data": data,
+            "model": body.get("model", "stub"),
+            "usage": {"prompt_tokens": 0, "total_tokens": 0},
+        }
+
+    @app.post("/v1/chat/completions")
+    async def chat_completions(request: Request):
+        body = await request.json()
+        error = await chat.apply()
+        app.state.calls["chat_error" if error else "chat"] += 1
+        if error:
+            return error
+        return {
+            "id": "chatcmpl-stub",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body.get("model", "stub"),
+            "choices": [
+                {
+                    "index": 0,
+                    "message": {"role": "assistant", "content": "Stub answer from the transcript context."},
+                    "finish_reason": "stop",
+                }
+            ],
+            "usage": {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0},
+        }
+
+    return app
+
+
+def create_transcript_app(faults: Faults, snippets_per_video: int = 200) -> FastAPI:
+    """GET /{video_id} returns a synthetic [{text, start, duration}] transcript (see TRANSCRIPT_BASE_URL)."""
+    app = _counting_app()
+
+    @app.get("/{video_id}")
+    async def transcript(video_id: str):
+        error = await faults.apply()
+        app.state.calls["transcript_error" if error else "transcript"] += 1
+        if error:
+            return error
+        return [
+            {
+                "text": f"{video_id} {i} " + " ".join(WORDS[(i + j) % len(WORDS)] for j in range(10)),
+                "start": i * 3.0,
+                "duration": 3.0,
+            }
+            for i in range(snippets_per_video)
+        ]
+
+    return app
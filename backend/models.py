@@ -1,8 +1,7 @@
 """SQLAlchemy models: User, UserDoc, Question."""
 from datetime import datetime
-from typing import Optional
 
-from sqlalchemy import DateTime, ForeignKey, String, Text, func
+from sqlalchemy import DateTime, ForeignKey, String, Text, UniqueConstraint, func
 from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column, relationship
 
 
@@ -18,20 +17,22 @@ class User(Base):
     password_hash: Mapped[str] = mapped_column(String(255), nullable=False)
     created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now())
 
-    user_doc: Mapped[Optional["UserDoc"]] = relationship("UserDoc", back_populates="user", uselist=False)
+    user_docs: Mapped[list["UserDoc"]] = relationship("UserDoc", back_populates="user", order_by="UserDoc.id")
     questions: Mapped[list["Question"]] = relationship("Question", back_populates="user", order_by="Question.created_at")
 
 
 class UserDoc(Base):
-    """One document (YouTube video) per user."""
+    """One document (YouTube video) in a user's corpus; all of them share one FAISS store."""
 
     __tablename__ = "user_docs"
+    __table_args__ = (UniqueConstraint("user_id", "video_id"),)
 
-    user_id: Mapped[int] = mapped_column(ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
+    user_id: Mapped[int] = mapped_column(ForeignKey("users.id", ondelete="CASCADE"), index=True, nullable=False)
     video_id: Mapped[str] = mapped_column(String(64), nullable=False)
     created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now())
 
-    user: Mapped["User"] = relationship("User", back_populates="user_doc")
+    user: Mapped["User"] = relationship("User", back_populates="user_docs")
 
 
 class Question(Base):
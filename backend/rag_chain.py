@@ -1,11 +1,31 @@
-"""RAG pipeline: transcript fetch, format, split, FAISS build/load, retriever, chain."""
+"""RAG pipeline: transcript fetch, format, split, per-user FAISS corpus, retriever, chain."""
+import json
+import os
+import pickle
+import tempfile
+import threading
+from contextlib import contextmanager
+from collections import OrderedDict
+from itertools import islice
 from pathlib import Path
-from typing import List
+from typing import Iterable, Iterator, List
+from urllib.parse import quote, urlencode
+from urllib.request import urlopen
 
+try:
+    import fcntl
+except ImportError:  # Windows: locks below are in-process only, so run a single worker
+    fcntl = None
+
+import faiss
+import numpy as np
 from youtube_transcript_api import YouTubeTranscriptApi
+from langchain_core.callbacks import CallbackManagerForRetrieverRun
 from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
 from langchain_text_splitters import RecursiveCharacterTextSplitter
 from langchain_openai import OpenAIEmbeddings, ChatOpenAI
+from langchain_community.docstore.in_memory import InMemoryDocstore
 from langchain_community.vectorstores import FAISS
 from langchain_core.prompts import PromptTemplate
 from langchain_core.runnables import RunnableParallel, RunnablePassthrough, RunnableLambda
@@ -15,10 +35,26 @@ from config import Settings
 
 settings = Settings()
 
+CHUNK_SIZE = 1000
+CHUNK_OVERLAP = 200
+
 # Embeddings and LLM (lazy / reused)
 _embeddings = None
 _llm = None
 
+# Per store directory: store_lock serializes writers (load -> add -> save); store_io_lock
+# pairs index.faiss with index.pkl while a save swaps them in or a reader loads them.
+# Each is a thread lock plus an flock on a file in the store, so it also holds across
+# uvicorn worker processes.
+_store_locks: dict[str, threading.Lock] = {}
+_store_io_locks: dict[str, threading.Lock] = {}
+_store_locks_guard = threading.Lock()
+
+# Loaded stores for /api/ask: path -> (file version, store, video -> positions), at most one
+# version per path, least recently used path evicted past settings.store_cache_size
+_store_cache: OrderedDict[str, tuple[tuple, FAISS, dict[str, np.ndarray]]] = OrderedDict()
+_store_cache_guard = threading.Lock()
+
 
 def get_embeddings() -> OpenAIEmbeddings:
     global _embeddings
@@ -28,7 +64,16 @@ def get_embeddings() -> OpenAIEmbeddings:
             raise ValueError(
                 "OPENAI_API_KEY is not set. Add it to .env in the project root or set the environment variable."
             )
-        _embeddings = OpenAIEmbeddings(model="text-embedding-3-small", api_key=api_key)
+        if settings.openai_base_url:
+            # OpenAI-compatible servers take plain strings, not tiktoken token arrays
+            _embeddings = OpenAIEmbeddings(
+                model="text-embedding-3-small",
+                api_key=api_key,
+                base_url=settings.openai_base_url,
+                check_embedding_ctx_length=False,
+            )
+        else:
+            _embeddings = OpenAIEmbeddings(model="text-embedding-3-small", api_key=api_key)
     return _embeddings
 
 
@@ -40,49 +85,296 @@ def get_llm() -> ChatOpenAI:
             raise ValueError(
                 "OPENAI_API_KEY is not set. Add it to .env in the project root or set the environment variable."
             )
-        _llm = ChatOpenAI(model="gpt-4o-mini", temperature=0.2, api_key=api_key)
+        _llm = ChatOpenAI(
+            model="gpt-4o-mini", temperature=0.2, api_key=api_key, base_url=settings.openai_base_url or None
+        )
     return _llm
 
 
-def fetch_and_format_transcript(video_id: str, languages: List[str] | None = None) -> List[dict]:
-    """Fetch transcript and return list of {text, start, duration}. Uses instance API: .fetch()."""
+def iter_transcript(video_id: str, languages: List[str] | None = None) -> Iterator[dict]:
+    """Fetch transcript and lazily yield {text, start, duration} per snippet.
+
+    The fetch runs eagerly so errors surface at call time; snippets are converted one at
+    a time instead of being copied into a second full-length list. When TRANSCRIPT_BASE_URL
+    is set, GET {base}/{video_id}?languages=.. must return that list as JSON instead.
+    """
     if languages is None:
         languages = ["en"]
+    if settings.transcript_base_url:
+        query = urlencode({"languages": ",".join(languages)})
+        url = f"{settings.transcript_base_url.rstrip('/')}/{quote(video_id)}?{query}"
+        with urlopen(url, timeout=30) as resp:
+            return iter(json.load(resp))
     ytt_api = YouTubeTranscriptApi()
     fetched_transcript = ytt_api.fetch(video_id, languages=languages)
-    return [
+    return (
         {"text": snippet.text, "start": snippet.start, "duration": snippet.duration}
         for snippet in fetched_transcript
-    ]
+    )
 
 
-def transcript_to_documents(formatted: List[dict]) -> List[Document]:
-    """Convert formatted transcript to LangChain Documents with metadata."""
-    return [
-        Document(
+def iter_chunks(snippets: Iterable[dict], video_id: str) -> Iterator[Document]:
+    """Split snippets into chunk Documents one snippet at a time (same chunks as split_documents)."""
+    splitter = RecursiveCharacterTextSplitter(chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP)
+    for item in snippets:
+        doc = Document(
             page_content=item["text"],
-            metadata={"start": item["start"], "duration": item["duration"]},
+            metadata={"video_id": video_id, "start": item["start"], "duration": item["duration"]},
         )
-        for item in formatted
-    ]
-
-
-def build_faiss_from_documents(docs: List[Document], store_path: str | Path) -> None:
-    """Chunk docs, build FAISS, save to store_path."""
-    path = Path(store_path)
-    path.mkdir(parents=True, exist_ok=True)
-    splitter = RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=200)
-    chunked = splitter.split_documents(docs)
-    embeddings = get_embeddings()
-    vector_store = FAISS.from_documents(chunked, embeddings)
-    vector_store.save_local(str(path))
-
-
-def load_faiss_retriever(store_path: str | Path, k: int = 4):
-    """Load FAISS from disk and return a retriever."""
-    embeddings = get_embeddings()
-    vector_store = FAISS.load_local(str(store_path), embeddings, allow_dangerous_deserialization=True)
-    return vector_store.as_retriever(search_type="similarity", search_kwargs={"k": k})
+        yield from splitter.split_documents([doc])
+
+
+def iter_batches(items: Iterable, batch_size: int) -> Iterator[list]:
+    """Yield lists of at most batch_size items, pulling from items only as needed."""
+    it = iter(items)
+    while batch := list(islice(it, batch_size)):
+        yield batch
+
+
+def chunk_id(video_id: str, n: int) -> str:
+    """Docstore id of a video's n-th chunk; the video id is recoverable from it."""
+    return f"{video_id}:{n}"
+
+
+def _path_lock(locks: dict[str, threading.Lock], store_path: str | Path) -> threading.Lock:
+    key = str(Path(store_path).resolve())
+    with _store_locks_guard:
+        return locks.setdefault(key, threading.Lock())
+
+
+@contextmanager
+def _file_lock(lock_path: Path, exclusive: bool = True):
+    """Advisory flock on lock_path, shared by every process using the store; no-op without fcntl."""
+    lock_path.parent.mkdir(parents=True, exist_ok=True)
+    with lock_path.open("a") as f:
+        if fcntl is not None:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+        yield  # closing the file releases the flock
+
+
+@contextmanager
+def store_lock(store_path: str | Path):
+    """Hold around load -> add -> save of one store directory."""
+    with _path_lock(_store_locks, store_path), _file_lock(Path(store_path) / ".write.lock"):
+        yield
+
+
+@contextmanager
+def store_io_lock(store_path: str | Path, exclusive: bool = True):
+    """Hold while a store's files are swapped in (exclusive) or loaded (shared across processes)."""
+    with _path_lock(_store_io_locks, store_path), _file_lock(Path(store_path) / ".io.lock", exclusive):
+        yield
+
+
+class CorpusIndex:
+    """A user's FAISS corpus: chunks of many videos, keyed "<video_id>:<n>" in the docstore.
+
+    add_transcript may be called from several threads at once (one per video); embedding
+    runs in parallel and only the index add is serialized. Hold store_lock(store_path)
+    from construction to save() so writers in other threads or worker processes don't
+    overwrite each other's videos (on platforms without fcntl, only within one process);
+    readers going through load_faiss_retriever see either the old or the new files.
+    """
+
+    def __init__(self, store_path: str | Path):
+        self.path = Path(store_path)
+        self.vector_store: FAISS | None = None
+        if (self.path / "index.faiss").exists():
+            self.vector_store = FAISS.load_local(
+                str(self.path), get_embeddings(), allow_dangerous_deserialization=True
+            )
+        self._videos: set[str] = set()
+        if self.vector_store is not None:
+            self._videos = {
+                doc_id.rpartition(":")[0] for doc_id in self.vector_store.index_to_docstore_id.values()
+            }
+        self._lock = threading.Lock()
+
+    def add_transcript(self, video_id: str, snippets: Iterable[dict], batch_size: int | None = None) -> int:
+        """Stream snippets -> chunks -> embedding batches -> incremental FAISS adds.
+
+        Only one batch of chunks and vectors is alive at a time, and each stage pulls from
+        the previous one, so a slow embedding call pauses splitting instead of letting work
+        pile up. If any batch fails, the video's chunks added so far are removed again.
+        Returns the number of chunks indexed.
+        """
+        embeddings = get_embeddings()
+        added: List[str] = []
+        with self._lock:
+            # Claimed up front so a second add of the same video in another thread is rejected too
+            if video_id in self._videos:
+                raise ValueError(f"Video {video_id} is already in this corpus.")
+            self._videos.add(video_id)
+        try:
+            for batch in iter_batches(iter_chunks(snippets, video_id), batch_size or settings.embed_batch_size):
+                texts = [doc.page_content for doc in batch]
+                metadatas = [doc.metadata for doc in batch]
+                ids = [chunk_id(video_id, len(added) + i) for i in range(len(batch))]
+                vectors = embeddings.embed_documents(texts)
+                with self._lock:
+                    if self.vector_store is None:
+                        self.vector_store = FAISS.from_embeddings(
+                            zip(texts, vectors), embeddings, metadatas=metadatas, ids=ids
+                        )
+                    else:
+                        self._add_embeddings(texts, vectors, metadatas, ids)
+                added.extend(ids)
+        except Exception:
+            with self._lock:
+                if added:
+                    self.vector_store.delete(added)
+                self._videos.discard(video_id)
+            raise
+        if not added:
+            with self._lock:
+                self._videos.discard(video_id)
+        return len(added)
+
+    def has_video(self, video_id: str) -> bool:
+        with self._lock:
+            return video_id in self._videos
+
+    def remove_video(self, video_id: str) -> None:
+        """Drop a video's chunks, e.g. ones saved by a request whose DB commit then failed."""
+        with self._lock:
+            ids = [
+                doc_id
+                for doc_id in self.vector_store.index_to_docstore_id.values()
+                if doc_id.rpartition(":")[0] == video_id
+            ]
+            if ids:
+                self.vector_store.delete(ids)
+            self._videos.discard(video_id)
+
+    def _add_embeddings(self, texts, vectors, metadatas, ids) -> None:
+        """add_embeddings, undoing the FAISS rows if the docstore rejects the ids afterwards."""
+        index = self.vector_store.index
+        before = index.ntotal
+        try:
+            self.vector_store.add_embeddings(zip(texts, vectors), metadatas=metadatas, ids=ids)
+        except Exception:
+            if index.ntotal > before:
+                index.remove_ids(np.arange(before, index.ntotal, dtype=np.int64))
+            raise
+
+    def save(self) -> None:
+        """Write the corpus to disk; nothing is written while it is empty.
+
+        Files are written to a temp directory next to the store and moved in with os.replace,
+        so a crash or a concurrent reader never sees a half-written index.pkl.
+        """
+        if self.vector_store is None or not self.vector_store.index_to_docstore_id:
+            return
+        if self.vector_store.index.ntotal != len(self.vector_store.index_to_docstore_id):
+            raise RuntimeError(
+                f"Refusing to save {self.path}: {self.vector_store.index.ntotal} vectors but "
+                f"{len(self.vector_store.index_to_docstore_id)} mapped chunks."
+            )
+        self.path.mkdir(parents=True, exist_ok=True)
+        with tempfile.TemporaryDirectory(dir=self.path.parent, prefix=f".{self.path.name}-") as tmp:
+            self.vector_store.save_local(tmp)
+            with store_io_lock(self.path):
+                for name in ("index.faiss", "index.pkl"):
+                    os.replace(Path(tmp) / name, self.path / name)
+
+
+def migrate_legacy_store(store_path: str | Path, video_id: str) -> None:
+    """Re-key a one-video store (random ids, no video_id metadata) to the corpus layout."""
+    pkl_path = Path(store_path) / "index.pkl"
+    if not pkl_path.exists():
+        return
+    with pkl_path.open("rb") as f:
+        docstore, index_to_docstore_id = pickle.load(f)
+    docs = {}
+    for position, old_id in sorted(index_to_docstore_id.items()):
+        doc = docstore.search(old_id)
+        doc.metadata["video_id"] = video_id
+        docs[chunk_id(video_id, position)] = doc
+    new_index_to_docstore_id = dict(enumerate(docs))
+    # Temp file + os.replace, as in CorpusIndex.save: a crash never leaves a truncated pickle
+    fd, tmp = tempfile.mkstemp(dir=pkl_path.parent, prefix=".index.pkl-")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            pickle.dump((InMemoryDocstore(docs), new_index_to_docstore_id), f)
+        os.replace(tmp, pkl_path)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+
+
+def video_positions(vector_store: FAISS) -> dict[str, np.ndarray]:
+    """Map each video id to the FAISS row ids holding its chunks, from the docstore id mapping."""
+    grouped: dict[str, list[int]] = {}
+    for position, doc_id in vector_store.index_to_docstore_id.items():
+        grouped.setdefault(doc_id.rpartition(":")[0], []).append(position)
+    return {video_id: np.array(positions, dtype=np.int64) for video_id, positions in grouped.items()}
+
+
+class CorpusRetriever(BaseRetriever):
+    """Similarity search over a corpus, optionally restricted to some videos.
+
+    The video filter is passed to FAISS as an id selector, so excluded chunks are skipped
+    during the search itself and k results come back whenever the videos have k chunks.
+    """
+
+    vector_store: FAISS
+    positions_by_video: dict[str, np.ndarray]
+    k: int = 4
+    video_ids: List[str] | None = None
+
+    def _get_relevant_documents(
+        self, query: str, *, run_manager: CallbackManagerForRetrieverRun
+    ) -> List[Document]:
+        params = None
+        if self.video_ids is not None:
+            parts = [self.positions_by_video[v] for v in self.video_ids if v in self.positions_by_video]
+            if not parts:
+                return []
+            positions = np.concatenate(parts)
+            params = faiss.SearchParameters(sel=faiss.IDSelectorBatch(positions))
+        vector = np.array([self.vector_store.embeddings.embed_query(query)], dtype=np.float32)
+        _, indices = self.vector_store.index.search(vector, self.k, params=params)
+        return [
+            self.vector_store.docstore.search(self.vector_store.index_to_docstore_id[int(i)])
+            for i in indices[0]
+            if i != -1
+        ]
+
+
+def _load_store(store_path: str, version: tuple) -> tuple[FAISS, dict[str, np.ndarray]]:
+    """Load a store and its video -> positions map, reusing the cached copy of this version.
+
+    A newer version replaces the path's entry, so old copies of a store that keeps
+    changing are dropped right away instead of waiting to be evicted.
+    """
+    with _store_cache_guard:
+        cached = _store_cache.get(store_path)
+        if cached is not None and cached[0] == version:
+            _store_cache.move_to_end(store_path)
+            return cached[1], cached[2]
+    vector_store = FAISS.load_local(store_path, get_embeddings(), allow_dangerous_deserialization=True)
+    positions = video_positions(vector_store)
+    with _store_cache_guard:
+        _store_cache[store_path] = (version, vector_store, positions)
+        _store_cache.move_to_end(store_path)
+        while len(_store_cache) > settings.store_cache_size:
+            _store_cache.popitem(last=False)
+    return vector_store, positions
+
+
+def load_faiss_retriever(store_path: str | Path, k: int = 4, video_ids: List[str] | None = None):
+    """Return a retriever over a user's corpus, optionally limited to video_ids.
+
+    Loaded stores are shared read-only between requests until a save replaces their files.
+    """
+    path = Path(store_path).resolve()
+    with store_io_lock(path, exclusive=False):
+        stats = [(path / name).stat() for name in ("index.faiss", "index.pkl")]
+        version = tuple((st.st_ino, st.st_mtime_ns, st.st_size) for st in stats)
+        vector_store, positions_by_video = _load_store(str(path), version)
+    return CorpusRetriever(
+        vector_store=vector_store, positions_by_video=positions_by_video, k=k, video_ids=video_ids
+    )
 
 
 def format_docs(docs):
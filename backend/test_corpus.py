@@ -0,0 +1,111 @@
+"""Corpus store, filtered retrieval, rollback and legacy migration, with fake embeddings."""
+import sqlite3
+
+import pytest
+from langchain_community.embeddings import DeterministicFakeEmbedding
+from langchain_community.vectorstores import FAISS
+from sqlalchemy import create_engine, inspect
+
+import database
+import rag_chain
+
+
+@pytest.fixture(autouse=True)
+def fake_embeddings(monkeypatch):
+    monkeypatch.setattr(rag_chain, "_embeddings", DeterministicFakeEmbedding(size=16))
+
+
+def snippets(video_id: str, count: int) -> list[dict]:
+    return [{"text": f"{video_id} line {i}", "start": float(i), "duration": 1.0} for i in range(count)]
+
+
+def build_corpus(store_path, videos: dict[str, int]) -> None:
+    corpus = rag_chain.CorpusIndex(store_path)
+    for video_id, count in videos.items():
+        corpus.add_transcript(video_id, snippets(video_id, count))
+    corpus.save()
+
+
+def test_filtered_retrieval_returns_only_chosen_videos(tmp_path):
+    store = tmp_path / "1"
+    build_corpus(store, {"a": 10, "b": 10, "c": 10})
+
+    unfiltered = rag_chain.load_faiss_retriever(store, k=30).invoke("line 3")
+    assert {doc.metadata["video_id"] for doc in unfiltered} == {"a", "b", "c"}
+
+    filtered = rag_chain.load_faiss_retriever(store, k=30, video_ids=["a", "c"]).invoke("b line 3")
+    assert len(filtered) == 20
+    assert {doc.metadata["video_id"] for doc in filtered} == {"a", "c"}
+
+    assert rag_chain.load_faiss_retriever(store, video_ids=["missing"]).invoke("line 3") == []
+
+
+def test_add_transcript_rolls_back_when_stream_fails(tmp_path):
+    store = tmp_path / "1"
+    build_corpus(store, {"a": 5})
+    corpus = rag_chain.CorpusIndex(store)
+
+    def failing_snippets():
+        yield from snippets("b", 7)
+        raise RuntimeError("transcript stream broke")
+
+    with pytest.raises(RuntimeError):
+        corpus.add_transcript("b", failing_snippets(), batch_size=3)
+
+    vector_store = corpus.vector_store
+    assert vector_store.index.ntotal == len(vector_store.index_to_docstore_id) == 5
+    assert not corpus.has_video("b")
+    corpus.add_transcript("b", snippets("b", 4))
+    corpus.save()
+    assert rag_chain.CorpusIndex(store).vector_store.index.ntotal == 9
+
+
+def test_add_transcript_rejects_video_already_in_store(tmp_path):
+    store = tmp_path / "1"
+    build_corpus(store, {"a": 5})
+    corpus = rag_chain.CorpusIndex(store)
+    with pytest.raises(ValueError):
+        corpus.add_transcript("a", snippets("a", 5))
+    assert corpus.vector_store.index.ntotal == len(corpus.vector_store.index_to_docstore_id) == 5
+
+
+def test_init_db_migrates_one_video_layout(tmp_path, monkeypatch):
+    db_path = tmp_path / "legacy.db"
+    stores = tmp_path / "stores"
+    with sqlite3.connect(db_path) as conn:
+        conn.executescript(
+            """
+            CREATE TABLE users (
+                id INTEGER NOT NULL PRIMARY KEY, email VARCHAR(255) NOT NULL,
+                password_hash VARCHAR(255) NOT NULL, created_at DATETIME DEFAULT CURRENT_TIMESTAMP NOT NULL
+            );
+            CREATE TABLE user_docs (
+                user_id INTEGER NOT NULL PRIMARY KEY REFERENCES users (id) ON DELETE CASCADE,
+                video_id VARCHAR(64) NOT NULL, created_at DATETIME DEFAULT CURRENT_TIMESTAMP NOT NULL
+            );
+            INSERT INTO users (id, email, password_hash) VALUES (1, 'a@example.com', 'x');
+            INSERT INTO user_docs (user_id, video_id) VALUES (1, 'legacyVid');
+            """
+        )
+    # Stores from before the corpus layout: random docstore ids, no video_id metadata
+    legacy = FAISS.from_texts(
+        [f"old line {i}" for i in range(6)], rag_chain.get_embeddings(), metadatas=[{"start": i} for i in range(6)]
+    )
+    legacy.save_local(str(stores / "1"))
+
+    engine = create_engine(f"sqlite:///{db_path}")
+    monkeypatch.setattr(database, "engine", engine)
+    monkeypatch.setattr(database.settings, "stores_path", str(stores))
+    database.init_db()
+
+    assert "id" in {c["name"] for c in inspect(engine).get_columns("user_docs")}
+    assert "user_docs_legacy" not in inspect(engine).get_table_names()
+    with engine.connect() as conn:
+        assert conn.exec_driver_sql("SELECT user_id, video_id FROM user_docs").all() == [(1, "legacyVid")]
+
+    corpus = rag_chain.CorpusIndex(stores / "1")
+    assert sorted(corpus.vector_store.index_to_docstore_id.values()) == [f"legacyVid:{i}" for i in range(6)]
+    assert corpus.has_video("legacyVid")
+    docs = rag_chain.load_faiss_retriever(stores / "1", k=6, video_ids=["legacyVid"]).invoke("old line 2")
+    assert len(docs) == 6
+    assert all(doc.metadata["video_id"] == "legacyVid" for doc in docs)
@@ -1,4 +1,5 @@
-"""POST /api/video – transcript + FAISS + save. Enforce one doc per user."""
+"""POST /api/video(s) – transcript + FAISS corpus + save. All of a user's videos share one index."""
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from typing import Annotated
 
@@ -10,15 +11,13 @@ from auth import get_current_user_id
 from config import Settings
 from database import get_db
 from models import UserDoc
-from rag_chain import (
-    fetch_and_format_transcript,
-    transcript_to_documents,
-    build_faiss_from_documents,
-)
+from rag_chain import CorpusIndex, iter_transcript, store_lock
 
 router = APIRouter()
 settings = Settings()
 
+MAX_BULK_VIDEOS = 100
+
 
 class VideoRequest(BaseModel):
     video_id: str
@@ -29,41 +28,124 @@ class VideoResponse(BaseModel):
     message: str
 
 
+class BulkVideoRequest(BaseModel):
+    video_ids: list[str]
+
+
+class BulkVideoResult(BaseModel):
+    video_id: str
+    status: str  # "added", "exists" or "failed"
+    detail: str = ""
+
+
+class BulkVideoResponse(BaseModel):
+    results: list[BulkVideoResult]
+
+
+def _user_video_ids(db: Session, user_id: int) -> list[str]:
+    rows = db.query(UserDoc.video_id).filter(UserDoc.user_id == user_id).order_by(UserDoc.id).all()
+    return [video_id for (video_id,) in rows]
+
+
+def _save_with_rows(db: Session, corpus: CorpusIndex, user_id: int, video_ids: list[str]) -> None:
+    """Insert UserDoc rows, save the corpus, then commit; call with store_lock held.
+
+    Flushing first surfaces constraint errors before anything is written to disk; if the
+    save fails, the rows are rolled back. Chunks left behind by a failed commit are removed
+    by the next request for that video (see CorpusIndex.remove_video).
+    """
+    for video_id in video_ids:
+        db.add(UserDoc(user_id=user_id, video_id=video_id))
+    db.flush()
+    try:
+        corpus.save()
+    except Exception:
+        db.rollback()
+        raise
+    db.commit()
+
+
 @router.post("/video", response_model=VideoResponse)
 def add_video(
     body: VideoRequest,
     user_id: Annotated[int, Depends(get_current_user_id)],
     db: Annotated[Session, Depends(get_db)],
 ):
-    existing = db.query(UserDoc).filter(UserDoc.user_id == user_id).first()
-    if existing:
-        raise HTTPException(
-            status_code=status.HTTP_409_CONFLICT,
-            detail="You already have one video. Only one allowed.",
-        )
     video_id = body.video_id.strip()
     if not video_id:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="video_id is required")
-    try:
-        formatted = fetch_and_format_transcript(video_id, languages=["en"])
-    except Exception as e:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail=f"Could not fetch transcript for this video: {e!s}",
-        )
-    if not formatted:
+    store_path = Path(settings.stores_path) / str(user_id)
+    with store_lock(store_path):
+        if video_id in _user_video_ids(db, user_id):
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail="This video is already in your library.",
+            )
+        try:
+            snippets = iter_transcript(video_id, languages=["en"])
+        except Exception as e:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Could not fetch transcript for this video: {e!s}",
+            )
+        corpus = CorpusIndex(store_path)
+        if corpus.has_video(video_id):
+            corpus.remove_video(video_id)
+        if corpus.add_transcript(video_id, snippets) == 0:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="No transcript available for this video.",
+            )
+        _save_with_rows(db, corpus, user_id, [video_id])
+    return VideoResponse(video_id=video_id, message="Video added successfully.")
+
+
+@router.post("/videos", response_model=BulkVideoResponse)
+def add_videos(
+    body: BulkVideoRequest,
+    user_id: Annotated[int, Depends(get_current_user_id)],
+    db: Annotated[Session, Depends(get_db)],
+):
+    """Ingest many videos (e.g. a playlist) into the user's corpus in parallel; one save at the end."""
+    video_ids = list(dict.fromkeys(v.strip() for v in body.video_ids if v.strip()))
+    if not video_ids:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="video_ids is required")
+    if len(video_ids) > MAX_BULK_VIDEOS:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
-            detail="No transcript available for this video.",
+            detail=f"At most {MAX_BULK_VIDEOS} videos per request.",
         )
-    docs = transcript_to_documents(formatted)
     store_path = Path(settings.stores_path) / str(user_id)
-    store_path.mkdir(parents=True, exist_ok=True)
-    build_faiss_from_documents(docs, store_path)
-    user_doc = UserDoc(user_id=user_id, video_id=video_id)
-    db.add(user_doc)
-    db.commit()
-    return VideoResponse(video_id=video_id, message="Video added successfully.")
+
+    def ingest(video_id: str) -> BulkVideoResult:
+        if video_id in existing:
+            return BulkVideoResult(video_id=video_id, status="exists")
+        try:
+            snippets = iter_transcript(video_id, languages=["en"])
+        except Exception as e:
+            return BulkVideoResult(
+                video_id=video_id,
+                status="failed",
+                detail=f"Could not fetch transcript for this video: {e!s}",
+            )
+        try:
+            added = corpus.add_transcript(video_id, snippets)
+        except Exception as e:
+            return BulkVideoResult(video_id=video_id, status="failed", detail=str(e))
+        if added == 0:
+            return BulkVideoResult(video_id=video_id, status="failed", detail="No transcript available for this video.")
+        return BulkVideoResult(video_id=video_id, status="added")
+
+    with store_lock(store_path):
+        existing = set(_user_video_ids(db, user_id))
+        corpus = CorpusIndex(store_path)
+        for video_id in video_ids:
+            if video_id not in existing and corpus.has_video(video_id):
+                corpus.remove_video(video_id)
+        with ThreadPoolExecutor(max_workers=settings.ingest_workers) as pool:
+            results = list(pool.map(ingest, video_ids))
+        _save_with_rows(db, corpus, user_id, [r.video_id for r in results if r.status == "added"])
+    return BulkVideoResponse(results=results)
 
 
 @router.get("/video")
@@ -71,13 +153,18 @@ def get_video(
     user_id: Annotated[int, Depends(get_current_user_id)],
     db: Annotated[Session, Depends(get_db)],
 ):
-    """Return the user's video_id and remaining question count (for dashboard)."""
+    """Return the user's video ids and remaining question count (for dashboard).
+
+    video_id is the first video added, kept for clients that show a single video.
+    """
     from sqlalchemy import func
     from models import Question
 
-    user_doc = db.query(UserDoc).filter(UserDoc.user_id == user_id).first()
-    if not user_doc:
-        return {"video_id": None, "remaining_questions": 2}
+    video_ids = _user_video_ids(db, user_id)
     count = db.query(func.count(Question.id)).filter(Question.user_id == user_id).scalar() or 0
-    remaining = max(0, 2 - count)
-    return {"video_id": user_doc.video_id, "remaining_questions": remaining}
+    remaining = max(0, settings.max_questions - count)
+    return {
+        "video_id": video_ids[0] if video_ids else None,
+        "video_ids": video_ids,
+        "remaining_questions": remaining,
+    }